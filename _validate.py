@@ -29,6 +29,8 @@
 #
 # Note: This script only performs checks and reports on issues without modifying the font data.
 
+import bisect
+from math import hypot
 
 # RELAXED mode: when True, smartly remove most false positives (and possibly introduce false negatives).
 # For collinear points, tries to avoid when there is a segment between them (e.g. between BC in collinear ABCD)
@@ -39,6 +41,28 @@
 
 RELAXED = True
 
+# Anchor names ignored in RELAXED mode
+SKIP_ANCHORS = frozenset({
+    'top','bottom','ogonek','center','topleft','topright',
+    '_top','_bottom','origin','start','end','_center',
+    '_ogonek','_topleft','_topright','left'
+})
+
+# Glyphs whose segment lengths (b) are not checked in RELAXED mode
+# (confusing how it is measuring lengths for these curves. seems fine, but triggers)
+SKIP_LENGTHS = frozenset({"divide", "ringcomb"})
+
+# Report templates for the per-glyph issues, (a) to (g)
+SMALL_SEG_FMT = "Small segment from (%s, %s) to (%s, %s) [bbox %s×%s]"
+SMALL_SEG_BBOX_FMT = "Small segment [bbox %s×%s]"
+LENGTH_AT_FMT = "Segment at (%s, %s) length ~%s (near %s)"
+LENGTH_FMT = "Segment length ~%s (near %s)"
+CLOSE_NODES_FMT = "Nodes at (%s, %s) and (%s, %s) very close (dist=%s)"
+COLLINEAR_FMT = "Extra node at (%s, %s) (collinear with neighbors)"
+OPEN_PATH_FMT = "Open path (endpoints at (%s, %s) and (%s, %s))"
+ISOLATED_FMT = "Isolated node at (%s, %s)"
+ANCHOR_FMT = "Anchor '%s' at (%s, %s)"
+
 font = Glyphs.font
 if font is None:
     print("No font open. Please open a font in Glyphs and try again.")
@@ -56,131 +80,267 @@ else:
 
     issues_by_glyph = {}
 
+    # Target lengths for (b), sorted so each segment only probes its nearest neighbours
+    # targets = [65, 85, 100, 110, 140, 150] # for bold masters
+    targets = [50, 60, 70, 500, 365, 440, 245, 650] # for roman masters
+    targets_sorted = sorted(targets)
+    max_target = targets_sorted[-1]
+
     def fmt_coord(x):
-        if abs(x - round(x)) < 0.001:
-            return int(round(x))
+        r = round(x)
+        if (x - r) * (x - r) < 1e-6:
+            return r
         return round(x, 2)
 
     def bboxes_touch(bb1, bb2):
+        # edges count as flush when within half a unit, as bounds come back as
+        # floats that need not match exactly even for edges on the same grid line
         if not bb1 or not bb2:
             return False
-        x1_min, y1_min = bb1.origin.x, bb1.origin.y
-        x1_max = x1_min + bb1.size.width
-        y1_max = y1_min + bb1.size.height
-        x2_min, y2_min = bb2.origin.x, bb2.origin.y
-        x2_max = x2_min + bb2.size.width
-        y2_max = y2_min + bb2.size.height
-        flush_x = (x1_max == x2_min or x2_max == x1_min) or (x1_max == x2_max or x1_min == x2_min)
-        flush_y = (y1_max == y2_min or y2_max == y1_min) or (y1_max == y2_max or y1_min == y2_min)
+        o1, s1 = bb1.origin, bb1.size
+        o2, s2 = bb2.origin, bb2.size
+        x1_min, y1_min = o1.x, o1.y
+        x1_max = x1_min + s1.width
+        y1_max = y1_min + s1.height
+        x2_min, y2_min = o2.x, o2.y
+        x2_max = x2_min + s2.width
+        y2_max = y2_min + s2.height
+        eq = lambda a, b: abs(a - b) < 0.5
+        flush_x = (eq(x1_max, x2_min) or eq(x2_max, x1_min)) or (eq(x1_max, x2_max) or eq(x1_min, x2_min))
+        flush_y = (eq(y1_max, y2_min) or eq(y2_max, y1_min)) or (eq(y1_max, y2_max) or eq(y1_min, y2_min))
         return flush_x or flush_y
 
+    def collinear_indices(xs, ys, closed):
+        # positions j of on-curve triples (j, j+1, j+2) with zero cross product
+        out = []
+        m = len(xs)
+        for j in range(m if closed else m - 2):
+            a, b, c = j, (j + 1) % m, (j + 2) % m
+            cross = (xs[b] - xs[a]) * (ys[c] - ys[a]) - (ys[b] - ys[a]) * (xs[c] - xs[a])
+            if abs(cross) < 1e-6:
+                out.append(j)
+        return out
+
+    def group_boxes(boxes, lo, hi):
+        # split boxes into runs along one axis (box[lo]..box[hi]), starting a new run
+        # whenever a box begins 9 or more units past everything before it
+        groups = []
+        reach = None
+        for box in sorted(boxes, key=lambda bx: bx[lo]):
+            if groups and box[lo] < reach:
+                groups[-1].append(box)
+                reach = max(reach, box[hi] + 9)
+            else:
+                groups.append([box])
+                reach = box[hi] + 9
+        return groups
+
+    def segment_ends(segment):
+        try:
+            return segment.firstPoint(), segment.lastPoint()
+        except:
+            return None, None
+
     for glyph in font.glyphs:
         layer = glyph.layers[masterID]
         glyph_name = glyph.name
         issues = []
+        skip_lengths = RELAXED and glyph_name.lower() in SKIP_LENGTHS
+
+        # Read paths, nodes and segments once per glyph; the checks below reuse
+        # these instead of crossing the bridge again for every section.
+        # On-curve nodes of the whole glyph are also laid out as parallel lists
+        # (X, Y, owning path), each path owning the run starting at on_start;
+        # (c) and (d) work on these, the node proxies are kept for reporting
+        path_cache = []
+        X, Y, paths_idx = [], [], []
+        for k, path in enumerate(layer.paths):
+            nodes = list(path.nodes)
+            on_indices = [i for i, nd in enumerate(nodes) if nd.type != "offcurve"]
+            on_start = len(X)
+            for i in on_indices:
+                nd = nodes[i]
+                X.append(nd.x)
+                Y.append(nd.y)
+                paths_idx.append(k)
+            path_cache.append((path, nodes, list(path.segments), path.closed, path.bounds, on_indices, on_start))
+
+        # (a), (b), (e) and (f) in one pass over the cached paths; their issues are
+        # kept in separate lists so the report still lists them in section order
+        small_issues = []
+        length_issues = []
+        open_issues = []
+        isolated_issues = []
+        for path, nodes, segments, closed, bounds, on_indices, on_start in path_cache:
+            for segment in segments:
+                seg_size = segment.bounds.size
+                seg_w, seg_h = seg_size.width, seg_size.height
+                # endpoints are only fetched once a check fires, then shared
+                ends = None
 
-        # (a) Small segments
-        for path in layer.paths:
-            for segment in path.segments:
-                seg_bounds = segment.bounds
-                seg_w, seg_h = seg_bounds.size.width, seg_bounds.size.height
+                # (a) Small segments
                 if (1 <= seg_w <= 9) or (1 <= seg_h <= 9):
-                    try:
-                        sp = segment.firstPoint(); ep = segment.lastPoint()
-                    except:
-                        sp = ep = None
+                    ends = segment_ends(segment)
+                    sp, ep = ends
                     if sp and ep:
                         x1, y1 = fmt_coord(sp.x), fmt_coord(sp.y)
                         x2, y2 = fmt_coord(ep.x), fmt_coord(ep.y)
-                        issues.append(f"Small segment from ({x1}, {y1}) to ({x2}, {y2}) [bbox {seg_w}×{seg_h}]")
+                        small_issues.append(SMALL_SEG_FMT % (x1, y1, x2, y2, seg_w, seg_h))
                     else:
-                        issues.append(f"Small segment [bbox {seg_w}×{seg_h}]")
+                        small_issues.append(SMALL_SEG_BBOX_FMT % (seg_w, seg_h))
                     count_small_segments += 1
 
-        # (b) Suspicious lengths
-        # targets = [65, 85, 100, 110, 140, 150] # for bold masters
-        targets = [50, 60, 70, 500, 365, 440, 245, 650] # for roman masters
-        for path in layer.paths:
-            for segment in path.segments:
-                L = segment.length()
+                # (b) Suspicious lengths
+                if skip_lengths:
+                    continue
+                # a segment is at least as long as its bbox's longer side,
+                # so skip the length computation when that is past every target
+                if max(seg_w, seg_h) > max_target + 3:
+                    continue
+                # a straight segment (2 points) spans its bbox diagonal exactly,
+                # only curves need the bridged length() computation
+                if len(segment) == 2:
+                    L = hypot(seg_w, seg_h)
+                else:
+                    L = segment.length()
                 if L is None:
                     continue
-                for t in targets:
-                    if 1 <= abs(L - t) <= 3:
-                        if RELAXED and abs(L-t) < 1:
-                            continue
-                        if RELAXED and glyph_name.lower() in ["divide", "ringcomb"]: # confusing how it is measuring lengths for these curves. seems fine, but triggers
+                k = bisect.bisect_left(targets_sorted, L)
+                for t in targets_sorted[max(k - 1, 0):k + 1]:
+                    d = abs(L - t)
+                    if 1 <= d <= 3:
+                        if RELAXED and d < 1:
                             continue
                         Lr = round(L, 1)
-                        try:
-                            sp, ep = segment.firstPoint(), segment.lastPoint()
-                        except:
-                            sp = ep = None
+                        if ends is None:
+                            ends = segment_ends(segment)
+                        sp, ep = ends
                         if sp and ep:
                             x1, y1 = fmt_coord(sp.x), fmt_coord(sp.y)
-                            x2, y2 = fmt_coord(ep.x), fmt_coord(ep.y)
-                            issues.append(f"Segment at ({x1}, {y1}) length ~{Lr} (near {t})")
+                            length_issues.append(LENGTH_AT_FMT % (x1, y1, Lr, t))
                         else:
-                            issues.append(f"Segment length ~{Lr} (near {t})")
+                            length_issues.append(LENGTH_FMT % (Lr, t))
                         count_suspicious_lengths += 1
                         break
 
+            # (f) Isolated nodes
+            cnt = len(nodes)
+            if cnt == 1:
+                nd = nodes[0]
+                if nd:
+                    x, y = fmt_coord(nd.x), fmt_coord(nd.y)
+                    isolated_issues.append(ISOLATED_FMT % (x, y))
+                    count_isolated += 1
+                continue
+
+            # (e) Open path endpoints
+            if closed or cnt == 0:
+                continue
+            first_node = nodes[0]
+            last_node = nodes[-1]
+            # guard against None
+            if first_node is None or last_node is None:
+                continue
+            if first_node.type == "offcurve":
+                for nd in nodes:
+                    if nd and nd.type != "offcurve":
+                        first_node = nd
+                        break
+            if last_node.type == "offcurve":
+                for nd in reversed(nodes):
+                    if nd and nd.type != "offcurve":
+                        last_node = nd
+                        break
+            # if still None or offcurve, skip
+            if first_node is None or last_node is None:
+                continue
+            fx, fy = fmt_coord(first_node.x), fmt_coord(first_node.y)
+            lx, ly = fmt_coord(last_node.x), fmt_coord(last_node.y)
+            open_issues.append(OPEN_PATH_FMT % (fx, fy, lx, ly))
+            count_open_paths += 1
+
+        issues.extend(small_issues)
+        issues.extend(length_issues)
+
         # (c) Very close nodes
-        pts = []
-        for path in layer.paths:
-            for node in path.nodes:
-                if node.type != "offcurve":
-                    pts.append((node, path))
-        n = len(pts)
-        for i in range(n):
-            n1, p1 = pts[i]
-            x1, y1 = n1.x, n1.y
-            for j in range(i+1, n):
-                n2, p2 = pts[j]
-                x2, y2 = n2.x, n2.y
-                dist_sq = (x2 - x1)**2 + (y2 - y1)**2
-                if dist_sq < 9**2:
-                    if RELAXED and dist_sq == 0 and p1 is not p2 and p1.closed and p2.closed:
-                        if bboxes_touch(p1.bounds, p2.bounds):
-                            continue
-                    d = round(dist_sq**0.5, 1)
-                    x1f, y1f = fmt_coord(x1), fmt_coord(y1)
-                    x2f, y2f = fmt_coord(x2), fmt_coord(y2)
-                    issues.append(f"Nodes at ({x1f}, {y1f}) and ({x2f}, {y2f}) very close (dist={d})")
-                    count_close_nodes += 1
+        # works on the cached coordinate lists, so the pairwise loop
+        # never goes through the bridge.
+        # Paths are first grouped by their on-curve extents: paths in different
+        # groups are 9 or more units apart in x or in y, so their nodes are
+        # never compared
+        boxes = []
+        for path, nodes, segments, closed, bounds, on_indices, on_start in path_cache:
+            on_stop = on_start + len(on_indices)
+            if on_stop > on_start:
+                xs, ys = X[on_start:on_stop], Y[on_start:on_stop]
+                boxes.append((on_start, on_stop, min(xs), max(xs), min(ys), max(ys)))
+        groups = [g for xg in group_boxes(boxes, 2, 3) for g in group_boxes(xg, 4, 5)]
+        # within a group, sweep over nodes sorted by x, stopping as soon as the
+        # x gap alone rules out every remaining node; hits are then put back in
+        # node order. Pairs are kept as a set of (lower, higher) node indices,
+        # so a pair is reported once however many times the scan reaches it
+        hits = set()
+        for group in groups:
+            order = sorted((i for box in group for i in range(box[0], box[1])), key=X.__getitem__)
+            n = len(order)
+            for a in range(n):
+                i = order[a]
+                x1, y1 = X[i], Y[i]
+                for b in range(a+1, n):
+                    j = order[b]
+                    if X[j] - x1 >= 9:
+                        break
+                    if (X[j] - x1)**2 + (Y[j] - y1)**2 < 81:
+                        hits.add((i, j) if i < j else (j, i))
+        # a node in a tight cluster shows up in several pairs, so format each once
+        fmt_cache = {}
+        for i, j in sorted(hits):
+            x1, y1, x2, y2 = X[i], Y[i], X[j], Y[j]
+            dist_sq = (x2 - x1)**2 + (y2 - y1)**2
+            pi, pj = paths_idx[i], paths_idx[j]
+            if RELAXED and dist_sq == 0 and pi != pj and path_cache[pi][3] and path_cache[pj][3]:
+                if bboxes_touch(path_cache[pi][4], path_cache[pj][4]):
+                    continue
+            d = round(dist_sq**0.5, 1)
+            if i not in fmt_cache:
+                fmt_cache[i] = (fmt_coord(x1), fmt_coord(y1))
+            if j not in fmt_cache:
+                fmt_cache[j] = (fmt_coord(x2), fmt_coord(y2))
+            (x1f, y1f), (x2f, y2f) = fmt_cache[i], fmt_cache[j]
+            issues.append(CLOSE_NODES_FMT % (x1f, y1f, x2f, y2f, d))
+            count_close_nodes += 1
 
         # (d) Collinear triples with segment-component skipping
-        for path in layer.paths:
-            nodes = path.nodes
-            # 1) collect indices of on-curve nodes
-            on_indices = [i for i, n in enumerate(nodes) if n.type != "offcurve"]
+        # 1) if RELAXED, find all nodes that are part of a segment component hint
+        #    (hints belong to the layer, so this is done once, not per path)
+        skip_nodes = set()
+        if RELAXED:
+            # 19 is the TrueType SEGMENT hint type
+            seg_hints = [h for h in layer.hints if h.type == 19 and (h.name or "").startswith("_segment.")]
+            for hint in seg_hints:
+                origin = getattr(hint, "originNode", None)
+                if origin:
+                    skip_nodes.add(origin)
+                target = getattr(hint, "targetNode", None)
+                if target:
+                    skip_nodes.add(target)
+
+        for path, nodes, segments, closed, bounds, on_indices, on_start in path_cache:
+            # 2) on-curve node indices come from the path cache
             m = len(on_indices)
             if m < 3:
                 continue
             total = len(nodes)
 
-            # 2) if RELAXED, find all nodes that are part of a segment component hint
-            skip_nodes = set()
-            if RELAXED:
-                for hint in layer.hints:
-                    # 19 is the TrueType SEGMENT hint type
-                    if hint.type == 19 and hint.name and hint.name.startswith("_segment."):
-                        origin = getattr(hint, "originNode", None)
-                        if origin:
-                            skip_nodes.add(origin)
-                        target = getattr(hint, "targetNode", None)
-                        if target:
-                            skip_nodes.add(target)
-
-            # 3) walk each triple A→B→C (wrap only if path.closed)
-            for j in range(m):
-                if not path.closed and j > m - 3:
-                    break
-
+            # 3) exact collinearity via cross-product over each triple A→B→C
+            #    (wrap only if path.closed), on this path's run of the cached coordinates
+            xs = X[on_start:on_start + m]
+            ys = Y[on_start:on_start + m]
+            for j in collinear_indices(xs, ys, closed):
                 iA = on_indices[j]
                 iB = on_indices[(j + 1) % m]
                 iC = on_indices[(j + 2) % m]
-                A, B, C = nodes[iA], nodes[iB], nodes[iC]
+                B, C = nodes[iB], nodes[iC]
 
                 # 4) skip if B or C sits on a segment component
                 if RELAXED and (B in skip_nodes or C in skip_nodes):
@@ -190,107 +350,74 @@ else:
                 if iB != (iA + 1) % total or iC != (iB + 1) % total:
                     continue
 
-                # 6) exact collinearity via cross-product
-                cross = (B.x - A.x) * (C.y - A.y) - (B.y - A.y) * (C.x - A.x)
-                if abs(cross) < 1e-6:
-                    xB, yB = fmt_coord(B.x), fmt_coord(B.y)
-                    issues.append(f"Extra node at ({xB}, {yB}) (collinear with neighbors)")
-                    count_collinear += 1
-                    
-        # (e) Open path endpoints
-        for path in layer.paths:
-            if not path.closed:
-                cnt = len(path.nodes)
-                if cnt <= 1:
-                    continue
-                first_node = path.nodes[0]
-                last_node = path.nodes[-1]
-                # guard against None
-                if first_node is None or last_node is None:
-                    continue
-                if first_node.type == "offcurve":
-                    for nd in path.nodes:
-                        if nd and nd.type != "offcurve":
-                            first_node = nd
-                            break
-                if last_node.type == "offcurve":
-                    for nd in reversed(path.nodes):
-                        if nd and nd.type != "offcurve":
-                            last_node = nd
-                            break
-                # if still None or offcurve, skip
-                if first_node is None or last_node is None:
-                    continue
-                fx, fy = fmt_coord(first_node.x), fmt_coord(first_node.y)
-                lx, ly = fmt_coord(last_node.x), fmt_coord(last_node.y)
-                issues.append(f"Open path (endpoints at ({fx}, {fy}) and ({lx}, {ly}))")
-                count_open_paths += 1
-
-        # (f) Isolated nodes
-        for path in layer.paths:
-            if len(path.nodes) == 1:
-                nd = path.nodes[0]
-                if nd:
-                    x, y = fmt_coord(nd.x), fmt_coord(nd.y)
-                    issues.append(f"Isolated node at ({x}, {y})")
-                    count_isolated += 1
+                xB, yB = fmt_coord(xs[(j + 1) % m]), fmt_coord(ys[(j + 1) % m])
+                issues.append(COLLINEAR_FMT % (xB, yB))
+                count_collinear += 1
+
+        issues.extend(open_issues)
+        issues.extend(isolated_issues)
 
         # (g) Anchors
         for anchor in layer.anchors:
             ax, ay = fmt_coord(anchor.position.x), fmt_coord(anchor.position.y)
             name = anchor.name or "(unnamed)"
-            skip = [
-                'top','bottom','ogonek','center','topleft','topright',
-                '_top','_bottom','origin','start','end','_center',
-                '_ogonek','_topleft','_topright','left'
-            ]
-            if RELAXED and name in skip:
+            if RELAXED and name in SKIP_ANCHORS:
                 continue
-            issues.append(f"Anchor '{name}' at ({ax}, {ay})")
+            issues.append(ANCHOR_FMT % (name, ax, ay))
             count_isolated += 1
 
-        issues_by_glyph[glyph_name] = issues or ["OK"]
+        # only glyphs with issues get an entry; missing means OK
+        if issues:
+            issues_by_glyph[glyph_name] = issues
+
+    # Report lines are collected here and printed once at the end,
+    # rather than one Macro Panel write per line
+    out = []
 
     # Print summary
-    print('////////////////////////////////////////////////////////////////')
-    print('////////////////////////////////////////////////////////////////')
-    print('////////////////////////////////////////////////////////////////')
-    print("Summary of Issues:")
-    print(f"  Small segments (<=10 units): {count_small_segments}")
-    print(f"  Near specific length segments (~65/85/100/110/140/150±3): {count_suspicious_lengths}")
-    print(f"  Very close nodes (<9 units apart): {count_close_nodes}")
-    print(f"  Collinear extra points: {count_collinear}")
-    print(f"  Open paths: {count_open_paths}")
-    print(f"  Isolated points or anchors: {count_isolated}\n")
+    out.append('////////////////////////////////////////////////////////////////')
+    out.append('////////////////////////////////////////////////////////////////')
+    out.append('////////////////////////////////////////////////////////////////')
+    out.append("Summary of Issues:")
+    out.append(f"  Small segments (<=10 units): {count_small_segments}")
+    out.append(f"  Near specific length segments (~65/85/100/110/140/150±3): {count_suspicious_lengths}")
+    out.append(f"  Very close nodes (<9 units apart): {count_close_nodes}")
+    out.append(f"  Collinear extra points: {count_collinear}")
+    out.append(f"  Open paths: {count_open_paths}")
+    out.append(f"  Isolated points or anchors: {count_isolated}\n")
 
     # Detailed per-glyph report
     for glyph in font.glyphs:
         name = glyph.name
-        glyph_issues = issues_by_glyph.get(name, ["OK"])
-        if glyph_issues == ["OK"]:
-            print(f"{name}: OK")
+        glyph_issues = issues_by_glyph.get(name)
+        if not glyph_issues:
+            out.append(f"{name}: OK")
         else:
-            print(f"{name}:")
+            out.append(f"{name}:")
             for issue in glyph_issues:
-                print(f"  - {issue}")
-    print("")
+                out.append(f"  - {issue}")
+    out.append("")
 
-    # Outline width groups
+    # Outline width and height groups (one bounds read per glyph)
     width_groups = {}
+    height_groups = {}
     for glyph in font.glyphs:
-        b = glyph.layers[masterID].bounds
-        w = 0 if b is None else int(round(b.size.width))
-        width_groups.setdefault(w, []).append(glyph.name)
-    print("Outline Width Groups (width: glyphs):")
+        layer = glyph.layers[masterID]
+        b = layer.bounds
+        if b is None:
+            w = h = 0
+        else:
+            size = b.size
+            w, h = int(round(size.width)), int(round(size.height))
+        name = glyph.name
+        width_groups.setdefault(w, []).append(name)
+        height_groups.setdefault(h, []).append(name)
+    out.append("Outline Width Groups (width: glyphs):")
     for w in sorted(width_groups):
-        print(f"  {w}: {', '.join(sorted(width_groups[w]))}")
+        out.append(f"  {w}: {', '.join(sorted(width_groups[w]))}")
 
-    # Outline height groups
-    height_groups = {}
-    for glyph in font.glyphs:
-        b = glyph.layers[masterID].bounds
-        h = 0 if b is None else int(round(b.size.height))
-        height_groups.setdefault(h, []).append(glyph.name)
-    print("Outline Height Groups (height: glyphs):")
+    out.append("Outline Height Groups (height: glyphs):")
     for h in sorted(height_groups):
-        print(f"  {h}: {', '.join(sorted(height_groups[h]))}")
\ No newline at end of file
+        out.append(f"  {h}: {', '.join(sorted(height_groups[h]))}")
+
+    print("\n".join(out))